@@ -1,13 +1,41 @@
 
 import asyncio
+import hashlib
+import operator
 import uuid
-import copy
+from functools import lru_cache
 from typing import Dict, Any, Optional
-from fastapi import FastAPI
-from pydantic import BaseModel
+
+import msgspec
+import numpy as np
+import orjson
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse
 import persistence  # local db module
 
-app = FastAPI(title="Mini Workflow Engine — Data Quality Pipeline (persistent)")
+try:
+    import numba
+except ImportError:  # pragma: no cover - numba is an optional accelerator
+    numba = None
+
+def _dumps_canonical(obj) -> bytes:
+    return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+class NumpyORJSONResponse(ORJSONResponse):
+    """ORJSONResponse that can serialize ndarray-backed state (NaN -> null)."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+
+app = FastAPI(title="Mini Workflow Engine — Data Quality Pipeline (persistent)",
+              default_response_class=NumpyORJSONResponse)
+
+@app.on_event("startup")
+async def _install_eager_tasks():
+    # Run freshly created tasks inline until their first await (Python 3.12+),
+    # saving an event-loop hop for every /graph/run create_task.
+    if hasattr(asyncio, "eager_task_factory"):
+        asyncio.get_running_loop().set_task_factory(asyncio.eager_task_factory)
 
 # -------------------------
 # In-memory caches
@@ -18,19 +46,68 @@ RUNS: Dict[str, Dict[str, Any]] = {}
 # -------------------------
 # Tools
 # -------------------------
-def profile_data_tool(state: Dict[str, Any]) -> Dict[str, Any]:
+def _to_float_array(data) -> np.ndarray:
+    """Convert a data list to float64, mapping None to NaN."""
+    if isinstance(data, np.ndarray):
+        return data
+    return np.array([np.nan if v is None else v for v in data], dtype=np.float64)
+
+def _null_mask(arr: np.ndarray) -> np.ndarray:
+    # Integer-typed data cannot hold nulls by construction.
+    if arr.dtype.kind == "f":
+        return np.isnan(arr)
+    return np.zeros(arr.shape, dtype=bool)
+
+def _maybe_to_ndarray(state: Dict[str, Any]) -> Any:
+    """Keep numeric data as a compact ndarray instead of boxed Python objects.
+
+    Picks int16 when every value and the anomaly bounds are ints that fit,
+    float32 otherwise (None becomes NaN). Float bounds force the float path
+    even for integer data, since clipping an int16 array against float
+    bounds in place is not allowed. Non-numeric data is left as the
+    original list. The converted array is written back to state so
+    downstream tools operate on the same buffer.
+    """
     data = state.get("data", [])
-    state["profile"] = {
-        "rows": len(data),
-        "nulls": sum(1 for v in data if v is None)
-    }
+    if isinstance(data, np.ndarray) or not isinstance(data, list) or not data:
+        return data
+    if not all(v is None or isinstance(v, (int, float)) for v in data):
+        return data
+
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in data):
+        low, high = state.get("anomaly_bounds", (0, 100))
+        info = np.iinfo(np.int16)
+        if (all(isinstance(b, int) and not isinstance(b, bool)
+                for b in (low, high))
+                and all(info.min <= v <= info.max for v in data)
+                and info.min <= low and high <= info.max):
+            arr = np.array(data, dtype=np.int16)
+            state["data"] = arr
+            return arr
+
+    arr = _to_float_array(data).astype(np.float32)
+    state["data"] = arr
+    return arr
+
+def profile_data_tool(state: Dict[str, Any]) -> Dict[str, Any]:
+    data = _maybe_to_ndarray(state)
+    if isinstance(data, np.ndarray):
+        rows, nulls = int(data.size), int(_null_mask(data).sum())
+    else:  # non-numeric data stays a list; count the slow way
+        rows, nulls = len(data), sum(1 for v in data if v is None)
+    state["profile"] = {"rows": rows, "nulls": nulls}
     return state
 
 def detect_anomalies_tool(state: Dict[str, Any]) -> Dict[str, Any]:
-    data = state.get("data", [])
+    data = _maybe_to_ndarray(state)
     low, high = state.get("anomaly_bounds", (0, 100))
-    anomalies = [v for v in data if v is not None and (v < low or v > high)]
-    state["anomalies"] = {"count": len(anomalies), "values": anomalies[:10]}
+    if isinstance(data, np.ndarray):
+        anom_mask = ~_null_mask(data) & ((data < low) | (data > high))
+        state["anomalies"] = {"count": int(anom_mask.sum()),
+                              "values": data[anom_mask][:10].tolist()}
+    else:
+        anomalies = [v for v in data if v is not None and (v < low or v > high)]
+        state["anomalies"] = {"count": len(anomalies), "values": anomalies[:10]}
     return state
 
 def generate_rules_tool(state: Dict[str, Any]) -> Dict[str, Any]:
@@ -43,25 +120,108 @@ def generate_rules_tool(state: Dict[str, Any]) -> Dict[str, Any]:
     state["rules"] = rules
     return state
 
+# Arrays below this size are not worth a JIT dispatch; NumPy handles them fine.
+_NUMBA_MIN_SIZE = 4096
+
+if numba is not None:
+    # Module-level kernel (no closure captures) so the .nbc cache stays stable.
+    @numba.njit(cache=True)
+    def _apply_rules_kernel(arr, fill, lo, hi, has_fill, has_clip):
+        for i in range(arr.size):
+            v = arr[i]
+            if has_fill and np.isnan(v):
+                arr[i] = fill
+            elif has_clip:
+                if v < lo:
+                    arr[i] = lo
+                elif v > hi:
+                    arr[i] = hi
+        return arr
+else:
+    _apply_rules_kernel = None
+
 def apply_rules_tool(state: Dict[str, Any]) -> Dict[str, Any]:
-    data = state.get("data", [])
-    rules = state.get("rules", [])
-    new_data = []
+    data = _maybe_to_ndarray(state)
+    rules_by_name = {r["name"]: r for r in state.get("rules", [])}
+    fill_rule = rules_by_name.get("fill_null")
+    clip_rule = rules_by_name.get("clip")
+
+    if not isinstance(data, np.ndarray):
+        # Non-numeric data: element-wise fallback.
+        new_data = []
+        for v in data:
+            if v is None:
+                new_data.append(fill_rule["value"] if fill_rule else v)
+            elif clip_rule and isinstance(v, (int, float)):
+                new_data.append(max(clip_rule["low"], min(clip_rule["high"], v)))
+            else:
+                new_data.append(v)
+        state["data"] = new_data
+        return state
+
+    arr = data
+    if (_apply_rules_kernel is not None and arr.size >= _NUMBA_MIN_SIZE
+            and arr.dtype.kind == "f"):
+        _apply_rules_kernel(
+            arr,
+            float(fill_rule["value"]) if fill_rule else 0.0,
+            float(clip_rule["low"]) if clip_rule else 0.0,
+            float(clip_rule["high"]) if clip_rule else 0.0,
+            fill_rule is not None,
+            clip_rule is not None,
+        )
+    else:
+        # Clip before filling: NaN passes through clip untouched, so filled
+        # nulls keep the fill value instead of being clipped into the bounds.
+        if clip_rule:
+            np.clip(arr, clip_rule["low"], clip_rule["high"], out=arr)
+        if fill_rule and arr.dtype.kind == "f":
+            arr[np.isnan(arr)] = fill_rule["value"]
 
-    for v in data:
-        if v is None:
-            fill_rule = next((r for r in rules if r["name"] == "fill_null"), None)
-            new_data.append(fill_rule["value"] if fill_rule else v)
-            continue
+    state["data"] = arr
+    return state
 
-        clip_rule = next((r for r in rules if r["name"] == "clip"), None)
-        if clip_rule:
-            low, high = clip_rule["low"], clip_rule["high"]
-            new_data.append(max(low, min(high, v)))
-        else:
-            new_data.append(v)
+def _data_quality_pass(arr: np.ndarray, low, high):
+    """Single traversal producing the null and anomaly masks."""
+    null_mask = _null_mask(arr)
+    anom_mask = ~null_mask & ((arr < low) | (arr > high))
+    return null_mask, anom_mask
+
+def fused_quality_tool(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Profile, detect anomalies, generate rules and apply them in one pass."""
+    data = _maybe_to_ndarray(state)
+    if not isinstance(data, np.ndarray):
+        # Non-numeric data: run the unfused tools in sequence.
+        profile_data_tool(state)
+        detect_anomalies_tool(state)
+        generate_rules_tool(state)
+        apply_rules_tool(state)
+        return state
+
+    low, high = state.get("anomaly_bounds", (0, 100))
+    arr = data
+    null_mask, anom_mask = _data_quality_pass(arr, low, high)
+    nulls = int(null_mask.sum())
+    anomaly_count = int(anom_mask.sum())
+
+    state["profile"] = {"rows": int(arr.size), "nulls": nulls}
+    state["anomalies"] = {"count": anomaly_count, "values": arr[anom_mask][:10].tolist()}
+
+    rules = []
+    if nulls > 0:
+        rules.append({"name": "fill_null", "action": "fill", "value": 0})
+    if anomaly_count > 0:
+        rules.append({"name": "clip", "action": "clip", "low": low, "high": high})
+    state["rules"] = rules
 
-    state["data"] = new_data
+    # Clip before filling so filled nulls keep the fill value (NaN passes
+    # through clip), matching the unfused tool chain.
+    if anomaly_count > 0:
+        np.clip(arr, low, high, out=arr)
+    if nulls > 0:
+        arr[null_mask] = 0
+
+    state["data"] = arr
     return state
 
 TOOLS = {
@@ -69,12 +229,65 @@ TOOLS = {
     "detect_anomalies": detect_anomalies_tool,
     "generate_rules": generate_rules_tool,
     "apply_rules": apply_rules_tool,
+    "fused_quality": fused_quality_tool,
+}
+
+# Top-level state keys each tool writes, so change detection only rehashes
+# what a tool can actually touch instead of the whole state.
+TOOL_WRITES = {
+    "profile": {"profile"},
+    "detect_anomalies": {"anomalies"},
+    "generate_rules": {"rules"},
+    "apply_rules": {"data"},
+    "fused_quality": {"profile", "anomalies", "rules", "data"},
 }
 
+# The canonical data-quality chain that fused_quality_tool replaces.
+_FUSED_CHAIN = ("profile", "detect_anomalies", "generate_rules", "apply_rules")
+
+def _fuse_canonical_chain(graph: Dict[str, Any]) -> None:
+    """Rewrite a profile→detect→rules→apply node chain into one fused node.
+
+    Only fires when the interior nodes are reachable solely through the
+    chain, so the rewrite cannot break other paths through the graph.
+    """
+    nodes, edges = graph["nodes"], graph["edges"]
+    for head in list(nodes):
+        chain = []
+        cur = head
+        for tool_name in _FUSED_CHAIN:
+            if cur is None or nodes.get(cur) != tool_name:
+                chain = None
+                break
+            chain.append(cur)
+            cur = edges.get(cur)
+        if not chain or len(set(chain)) != len(_FUSED_CHAIN):
+            continue
+
+        interior = chain[1:]
+        if graph["start_node"] in interior:
+            continue
+        if any(dst in interior and src not in chain for src, dst in edges.items()):
+            continue
+
+        after_tail = edges.get(chain[-1])
+        if after_tail in interior:
+            continue
+        nodes[head] = "fused_quality"
+        for n in interior:
+            nodes.pop(n)
+            edges.pop(n, None)
+        if after_tail is not None:
+            # Kept even when the target is unknown: the traversal compiler
+            # maps it to _BAD_EDGE and fails the run like an unfused graph.
+            edges[head] = after_tail
+        else:
+            edges.pop(head, None)
+
 # -------------------------
 # Graph model
 # -------------------------
-class GraphDef(BaseModel):
+class GraphDef(msgspec.Struct):
     nodes: Dict[str, str]
     edges: Dict[str, str]
     start_node: str
@@ -83,106 +296,235 @@ class GraphDef(BaseModel):
 # -------------------------
 # Helpers
 # -------------------------
-def _resolve_metric(state: Dict[str, Any], metric_path: str):
+def _resolve_metric(state: Dict[str, Any], metric_parts):
     cur = state
-    for part in metric_path.split("."):
+    for part in metric_parts:
         if cur is None:
             return None
         cur = cur.get(part)
     return cur
 
-def _persist_run(run_id: str):
-    if run_id in RUNS:
-        persistence.update_run(run_id, RUNS[run_id])
+_COND_OPS = {
+    "<=": operator.le,
+    "<":  operator.lt,
+    ">=": operator.ge,
+    ">":  operator.gt,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+def _compile_loop_condition(graph: Dict[str, Any]) -> None:
+    """Resolve the loop condition's operator and metric path once per graph.
+
+    The compiled fields are runtime-only (not serializable) and must be set
+    after save_graph / re-set after load_graph.
+    """
+    cond = graph.get("loop_condition")
+    if not cond:
+        return
+    graph["_loop_cond_op"] = _COND_OPS.get(cond["op"])
+    graph["_loop_cond_parts"] = cond["metric"].split(".")
+    graph["_loop_cond_value"] = cond["value"]
+
+# Edge sentinels: no outgoing edge ends the run; an edge whose target is
+# not a known node fails it, like the name-based walk did.
+_NO_EDGE = -1
+_BAD_EDGE = -2
+
+def _compile_traversal(graph: Dict[str, Any]) -> None:
+    """Index the immutable graph by integer node ids.
+
+    The execution loop then does list indexing (and calls tool functions
+    directly) instead of hashing node-name strings through three dicts per
+    iteration. Runtime-only, like the compiled loop condition.
+    """
+    names = list(graph["nodes"])
+    ids = {name: i for i, name in enumerate(names)}
+    tool_names = [graph["nodes"][n] for n in names]
+
+    def _edge_id(name: str) -> int:
+        target = graph["edges"].get(name)
+        if target is None:
+            return _NO_EDGE
+        return ids.get(target, _BAD_EDGE)
+
+    graph["_traversal"] = {
+        "ids": ids,
+        "names": names,
+        "tool_names": tool_names,
+        "tools": [TOOLS.get(t) for t in tool_names],
+        "edges": [_edge_id(n) for n in names],
+    }
+
+def _prepare_graph(graph: Dict[str, Any]) -> None:
+    _compile_loop_condition(graph)
+    _compile_traversal(graph)
+
+@lru_cache(maxsize=1024)
+def _load_graph_cached(graph_id: str) -> Optional[Dict[str, Any]]:
+    return persistence.load_graph(graph_id)
+
+def get_graph(graph_id: str) -> Optional[Dict[str, Any]]:
+    """Resolve a graph: in-memory dict first, then the LRU'd SQLite load."""
+    graph = GRAPHS.get(graph_id)
+    if graph is None:
+        graph = _load_graph_cached(graph_id)
+        if graph is not None:
+            _prepare_graph(graph)
+            GRAPHS[graph_id] = graph
+    return graph
+
+def _state_hash(state: Dict[str, Any]) -> bytes:
+    return hashlib.blake2b(_dumps_canonical(state)).digest()
+
+# Number of log lines already flushed to the run_log table, per run.
+_LOG_FLUSHED: Dict[str, int] = {}
+
+def _persist_run_sync(run_id: str, state_changed: bool):
+    run = RUNS.get(run_id)
+    if run is None:
+        return
+    log = run.get("log", [])
+    flushed = _LOG_FLUSHED.get(run_id, 0)
+    if len(log) > flushed:
+        persistence.append_run_log(run_id, flushed, log[flushed:])
+        _LOG_FLUSHED[run_id] = len(log)
+    persistence.update_run_status(run_id, run["status"])
+    if state_changed:
+        persistence.update_run_state(run_id, run.get("state", {}))
+
+async def _persist_run(run_id: str, state_changed: bool = True):
+    # SQLite I/O happens in a worker thread so the event loop never blocks
+    # on a write (or on a WAL checkpoint that a write triggers).
+    await asyncio.to_thread(_persist_run_sync, run_id, state_changed)
 
 # -------------------------
 # Execution Engine
 # -------------------------
-async def execute_graph(graph_id: str, run_id: str):
-    graph = GRAPHS.get(graph_id) or persistence.load_graph(graph_id)
+async def execute_graph(graph: Optional[Dict[str, Any]], run_id: str):
     if graph is None:
         RUNS[run_id]["status"] = "failed"
         RUNS[run_id]["log"].append("Graph not found during execution.")
-        _persist_run(run_id)
+        await _persist_run(run_id, state_changed=False)
         return
 
-    GRAPHS[graph_id] = graph
+    if "_traversal" not in graph:
+        _prepare_graph(graph)
+    trav = graph["_traversal"]
 
     state = RUNS[run_id]["state"]
     log = RUNS[run_id]["log"]
-    current = graph["start_node"]
+    current = trav["ids"].get(graph["start_node"], -1)
     visited = 0
 
-    prev_state = copy.deepcopy(state)
+    if current < 0:
+        log.append(f"Start node not found: {graph['start_node']}")
+        RUNS[run_id]["status"] = "failed"
+        await _persist_run(run_id, state_changed=False)
+        return
+
+    # Cheap change detection: one digest per top-level key, rehashing only
+    # the keys the executed tool declares it writes.
+    key_hashes = {k: _state_hash(v) for k, v in state.items()}
 
     def condition_satisfied():
-        cond = graph.get("loop_condition")
-        if not cond:
+        cond_op = graph.get("_loop_cond_op")
+        if cond_op is None:
             return False
-        metric_val = _resolve_metric(state, cond["metric"])
+        metric_val = _resolve_metric(state, graph["_loop_cond_parts"])
         if metric_val is None:
             return False
-        op = cond["op"]
-        val = cond["value"]
-        return (
-            (op == "<=" and metric_val <= val) or
-            (op == "<"  and metric_val <  val) or
-            (op == ">=" and metric_val >= val) or
-            (op == ">"  and metric_val >  val) or
-            (op == "==" and metric_val == val) or
-            (op == "!=" and metric_val != val)
-        )
-
-    while current and visited < 200:
-        visited += 1
-        tool = TOOLS.get(graph["nodes"].get(current))
-        log.append(f"Running node: {current}")
-
-        if not tool:
-            log.append(f"Tool not found: {graph['nodes'].get(current)}")
-            RUNS[run_id]["status"] = "failed"
-            _persist_run(run_id)
-            return
-
-        try:
-            tool(state)
-        except Exception as e:
-            log.append(f"Exception: {e}")
-            RUNS[run_id]["status"] = "failed"
-            _persist_run(run_id)
-            return
-
-        RUNS[run_id]["state"] = state
-        RUNS[run_id]["log"] = log.copy()
-        _persist_run(run_id)
-
-        if condition_satisfied():
-            log.append("Loop stop condition satisfied.")
-            RUNS[run_id]["status"] = "finished"
-            _persist_run(run_id)
-            return
-
-        if state == prev_state:
-            log.append("State unchanged — stopping.")
-            RUNS[run_id]["status"] = "finished"
-            _persist_run(run_id)
-            return
-
-        prev_state = copy.deepcopy(state)
-        current = graph["edges"].get(current)
-
-    RUNS[run_id]["status"] = "finished"
-    log.append("Execution finished.")
-    _persist_run(run_id)
+        return cond_op(metric_val, graph["_loop_cond_value"])
+
+    # All per-node writes happen inside one transaction; the single COMMIT
+    # in the finally block replaces hundreds of per-update fsyncs.
+    await asyncio.to_thread(persistence.begin_run_tx)
+    try:
+        while current >= 0 and visited < 200:
+            visited += 1
+            tool_name = trav["tool_names"][current]
+            tool = trav["tools"][current]
+            log.append(f"Running node: {trav['names'][current]}")
+
+            if not tool:
+                log.append(f"Tool not found: {tool_name}")
+                RUNS[run_id]["status"] = "failed"
+                await _persist_run(run_id, state_changed=False)
+                return
+
+            try:
+                tool(state)
+            except Exception as e:
+                log.append(f"Exception: {e}")
+                RUNS[run_id]["status"] = "failed"
+                await _persist_run(run_id)
+                return
+
+            # state and log already alias RUNS[run_id] entries; no snapshot
+            # copy needed (the old log.copy() was O(len(log)) per node).
+            # Rehash only the keys this tool declares it writes (all keys
+            # for tools without a declaration).
+            writes = TOOL_WRITES.get(tool_name) or state.keys()
+            changed = False
+            for k in writes:
+                h = _state_hash(state.get(k))
+                if key_hashes.get(k) != h:
+                    key_hashes[k] = h
+                    changed = True
+
+            if condition_satisfied():
+                log.append("Loop stop condition satisfied.")
+                RUNS[run_id]["status"] = "finished"
+                await _persist_run(run_id, state_changed=changed)
+                return
+
+            if not changed:
+                log.append("State unchanged — stopping.")
+                RUNS[run_id]["status"] = "finished"
+                await _persist_run(run_id, state_changed=False)
+                return
+
+            await _persist_run(run_id)
+            nxt = trav["edges"][current]
+            if nxt == _BAD_EDGE:
+                # Dangling edge target: fail the run, as the name-based
+                # walk did when it reached the unknown node.
+                bad = graph["edges"].get(trav["names"][current])
+                log.append(f"Running node: {bad}")
+                log.append("Tool not found: None")
+                RUNS[run_id]["status"] = "failed"
+                await _persist_run(run_id, state_changed=False)
+                return
+            current = nxt
+
+        RUNS[run_id]["status"] = "finished"
+        log.append("Execution finished.")
+        await _persist_run(run_id, state_changed=False)
+    finally:
+        await asyncio.to_thread(persistence.commit_run_tx)
+        _LOG_FLUSHED.pop(run_id, None)
+
+async def execute_graph_by_id(graph_id: str, run_id: str):
+    """Legacy entry point for callers that only hold a graph id."""
+    await execute_graph(get_graph(graph_id), run_id)
 
 # -------------------------
 # API Endpoints
 # -------------------------
 @app.post("/graph/create")
-async def create_graph(g: GraphDef):
+async def create_graph(request: Request):
+    try:
+        g = msgspec.json.decode(await request.body(), type=GraphDef)
+    except msgspec.DecodeError as e:
+        return ORJSONResponse({"error": str(e)}, status_code=400)
+
     graph_id = str(uuid.uuid4())
-    GRAPHS[graph_id] = g.dict()
-    persistence.save_graph(graph_id, GRAPHS[graph_id])
+    graph = msgspec.to_builtins(g)
+    _fuse_canonical_chain(graph)
+    persistence.save_graph(graph_id, graph)
+    _load_graph_cached.cache_clear()
+    _prepare_graph(graph)
+    GRAPHS[graph_id] = graph
     return {"graph_id": graph_id}
 
 @app.post("/graph/run")
@@ -191,36 +533,34 @@ async def run_graph(payload: Dict[str, Any]):
     if not graph_id:
         return {"error": "missing graph_id"}, 400
 
-    graph = GRAPHS.get(graph_id) or persistence.load_graph(graph_id)
+    graph = get_graph(graph_id)
     if graph is None:
         return {"error": "graph_id not found"}, 400
 
-    GRAPHS[graph_id] = graph
-
     init_state = payload.get("initial_state", {})
     run_id = str(uuid.uuid4())
     RUNS[run_id] = {"state": init_state, "log": [], "status": "running"}
-    persistence.save_run(run_id, RUNS[run_id])
+    await asyncio.to_thread(persistence.save_run, run_id, RUNS[run_id])
 
-    asyncio.create_task(execute_graph(graph_id, run_id))
+    asyncio.create_task(execute_graph(graph, run_id))
     return {"run_id": run_id}
 
 @app.post("/graph/run_sync")
 async def run_graph_sync(payload: Dict[str, Any]):
     graph_id = payload.get("graph_id")
-    graph = GRAPHS.get(graph_id) or persistence.load_graph(graph_id)
+    graph = get_graph(graph_id)
     if graph is None:
         return {"error": "graph_id not found"}, 400
 
-    GRAPHS[graph_id] = graph
-
     init_state = payload.get("initial_state", {})
     run_id = str(uuid.uuid4())
     RUNS[run_id] = {"state": init_state, "log": [], "status": "running"}
-    persistence.save_run(run_id, RUNS[run_id])
+    await asyncio.to_thread(persistence.save_run, run_id, RUNS[run_id])
 
-    await execute_graph(graph_id, run_id)
-    return RUNS[run_id]
+    await execute_graph(graph, run_id)
+    # Return the response directly: jsonable_encoder cannot handle the
+    # ndarray-backed state, but orjson with OPT_SERIALIZE_NUMPY can.
+    return NumpyORJSONResponse(RUNS[run_id])
 
 @app.get("/graph/state/{run_id}")
 async def get_run_state(run_id: str):
@@ -229,4 +569,13 @@ async def get_run_state(run_id: str):
         return {"error": "run_id not found"}, 404
 
     RUNS[run_id] = run
-    return run
+    return NumpyORJSONResponse(run)
+
+if __name__ == "__main__":
+    import uvicorn
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:  # uvloop is not available on Windows
+        pass
+    uvicorn.run(app, host="0.0.0.0", port=8000)
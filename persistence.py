@@ -1,83 +1,194 @@
 """
 persistence.py
 Simple SQLite persistence for graphs and runs.
-Stores JSON strings for portability and simplicity.
+Stores JSON blobs (msgspec-encoded) for portability and simplicity.
+
+Uses a single long-lived connection (shared across threads behind a lock)
+instead of opening/closing a connection per call, so the hot run-update
+path avoids repeated connect/teardown and PRAGMA re-parsing.
 """
 
+import base64
 import sqlite3
-import json
+import threading
 from typing import Optional
 
+import msgspec
+import numpy as np
+
 DB_PATH = "workflow.db"
 
-def _get_conn():
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.execute("PRAGMA journal_mode=WAL;")
-    return conn
+_CONN: Optional[sqlite3.Connection] = None
+_LOCK = threading.Lock()
+
+def _get_conn() -> sqlite3.Connection:
+    global _CONN
+    if _CONN is None:
+        conn = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA synchronous=NORMAL;")
+        conn.execute("PRAGMA temp_store=MEMORY;")
+        conn.execute("PRAGMA cache_size=-65536;")
+        conn.execute("PRAGMA busy_timeout=5000;")
+        conn.execute("PRAGMA wal_autocheckpoint=1000;")
+        _CONN = conn
+    return _CONN
+
+# Checkpoint the WAL ourselves every so many writes so a run update never
+# eats the full checkpoint cost mid-request.
+_CHECKPOINT_EVERY = 64
+_writes_since_checkpoint = 0
+
+def _maybe_checkpoint(conn: sqlite3.Connection):
+    """Passively checkpoint after a batch of writes. Caller holds _LOCK."""
+    global _writes_since_checkpoint
+    _writes_since_checkpoint += 1
+    if _writes_since_checkpoint >= _CHECKPOINT_EVERY and not conn.in_transaction:
+        conn.execute("PRAGMA wal_checkpoint(PASSIVE);")
+        _writes_since_checkpoint = 0
 
 def init_db():
     conn = _get_conn()
-    cur = conn.cursor()
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS graphs (
-        graph_id TEXT PRIMARY KEY,
-        graph_json TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-    """)
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS runs (
-        run_id TEXT PRIMARY KEY,
-        run_json TEXT NOT NULL,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-    """)
-    conn.commit()
-    conn.close()
+    with _LOCK:
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS graphs (
+            graph_id TEXT PRIMARY KEY,
+            graph_json TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """)
+        # Detect the legacy single-blob runs schema; migrated below once the
+        # new tables exist.
+        cols = {row[1] for row in conn.execute("PRAGMA table_info(runs);")}
+        legacy = "run_json" in cols
+        if legacy:
+            conn.execute("ALTER TABLE runs RENAME TO runs_legacy;")
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS runs (
+            run_id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            state_json TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS run_log (
+            run_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            line TEXT NOT NULL,
+            PRIMARY KEY (run_id, seq)
+        );
+        """)
+        if legacy:
+            # Split each old blob into the status/state columns and move its
+            # log lines into run_log, so existing runs survive the upgrade.
+            rows = conn.execute(
+                "SELECT run_id, run_json, updated_at FROM runs_legacy;").fetchall()
+            for run_id, blob, updated_at in rows:
+                run = msgspec.json.decode(blob)
+                conn.execute(
+                    "INSERT OR REPLACE INTO runs (run_id, status, state_json, updated_at) VALUES (?, ?, ?, ?)",
+                    (run_id, run.get("status", "running"),
+                     _encode_state(run.get("state", {})), updated_at))
+                conn.executemany(
+                    "INSERT OR REPLACE INTO run_log (run_id, seq, line) VALUES (?, ?, ?)",
+                    [(run_id, i, line) for i, line in enumerate(run.get("log", []))])
+            conn.execute("DROP TABLE runs_legacy;")
 
 def save_graph(graph_id: str, graph_obj: dict):
     conn = _get_conn()
-    cur = conn.cursor()
-    cur.execute("REPLACE INTO graphs (graph_id, graph_json) VALUES (?, ?)",
-                (graph_id, json.dumps(graph_obj)))
-    conn.commit()
-    conn.close()
+    with _LOCK:
+        conn.execute("REPLACE INTO graphs (graph_id, graph_json) VALUES (?, ?)",
+                     (graph_id, msgspec.json.encode(graph_obj)))
 
 def load_graph(graph_id: str) -> Optional[dict]:
     conn = _get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT graph_json FROM graphs WHERE graph_id = ?", (graph_id,))
-    row = cur.fetchone()
-    conn.close()
+    with _LOCK:
+        row = conn.execute("SELECT graph_json FROM graphs WHERE graph_id = ?",
+                           (graph_id,)).fetchone()
     if not row:
         return None
-    return json.loads(row[0])
+    return msgspec.json.decode(row[0])
+
+def _encode_state(state: dict) -> bytes:
+    """Encode state; ndarray data goes in as raw bytes, not a JSON list."""
+    data = state.get("data")
+    if isinstance(data, np.ndarray):
+        state = dict(state)
+        state["data"] = {"__ndarray__": base64.b64encode(data.tobytes()).decode(),
+                         "dtype": str(data.dtype),
+                         "shape": list(data.shape)}
+    return msgspec.json.encode(state)
+
+def _decode_state(raw) -> dict:
+    state = msgspec.json.decode(raw)
+    data = state.get("data")
+    if isinstance(data, dict) and "__ndarray__" in data:
+        state["data"] = np.frombuffer(base64.b64decode(data["__ndarray__"]),
+                                      dtype=data["dtype"]).reshape(data["shape"]).copy()
+    return state
 
 def save_run(run_id: str, run_obj: dict):
     conn = _get_conn()
-    cur = conn.cursor()
-    cur.execute("REPLACE INTO runs (run_id, run_json, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)",
-                (run_id, json.dumps(run_obj)))
-    conn.commit()
-    conn.close()
+    with _LOCK:
+        conn.execute("REPLACE INTO runs (run_id, status, state_json, updated_at) VALUES (?, ?, ?, CURRENT_TIMESTAMP)",
+                     (run_id, run_obj.get("status", "running"),
+                      _encode_state(run_obj.get("state", {}))))
+        _maybe_checkpoint(conn)
 
 def load_run(run_id: str) -> Optional[dict]:
     conn = _get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT run_json FROM runs WHERE run_id = ?", (run_id,))
-    row = cur.fetchone()
-    conn.close()
+    with _LOCK:
+        row = conn.execute("SELECT status, state_json FROM runs WHERE run_id = ?",
+                           (run_id,)).fetchone()
     if not row:
         return None
-    return json.loads(row[0])
+    return {"state": _decode_state(row[1]),
+            "log": load_run_log(run_id),
+            "status": row[0]}
+
+def append_run_log(run_id: str, start_seq: int, lines: list):
+    conn = _get_conn()
+    rows = [(run_id, start_seq + i, line) for i, line in enumerate(lines)]
+    with _LOCK:
+        conn.executemany("INSERT OR REPLACE INTO run_log (run_id, seq, line) VALUES (?, ?, ?)",
+                         rows)
+        _maybe_checkpoint(conn)
+
+def load_run_log(run_id: str) -> list:
+    conn = _get_conn()
+    with _LOCK:
+        rows = conn.execute("SELECT line FROM run_log WHERE run_id = ? ORDER BY seq",
+                            (run_id,)).fetchall()
+    return [r[0] for r in rows]
+
+def begin_run_tx():
+    """Open a write transaction so per-node run updates share one commit."""
+    conn = _get_conn()
+    with _LOCK:
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE;")
+
+def commit_run_tx():
+    conn = _get_conn()
+    with _LOCK:
+        if conn.in_transaction:
+            conn.execute("COMMIT;")
+
+def update_run_status(run_id: str, status: str):
+    """Cheap per-step update: touches a tiny cell, not the state blob."""
+    conn = _get_conn()
+    with _LOCK:
+        conn.execute("UPDATE runs SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE run_id = ?",
+                     (status, run_id))
+        _maybe_checkpoint(conn)
 
-def update_run(run_id: str, run_obj: dict):
+def update_run_state(run_id: str, state: dict):
     conn = _get_conn()
-    cur = conn.cursor()
-    cur.execute("UPDATE runs SET run_json = ?, updated_at = CURRENT_TIMESTAMP WHERE run_id = ?",
-                (json.dumps(run_obj), run_id))
-    conn.commit()
-    conn.close()
+    with _LOCK:
+        conn.execute("UPDATE runs SET state_json = ?, updated_at = CURRENT_TIMESTAMP WHERE run_id = ?",
+                     (_encode_state(state), run_id))
+        _maybe_checkpoint(conn)
 
 # initialize DB on import
 init_db()